@@ -0,0 +1,137 @@
+/**
+ * Static asset benchmark for server.js
+ *
+ * Starts the server reading files from disk on every request
+ * (STATIC_PRELOAD=0, the old behaviour) and again serving preloaded,
+ * precompressed assets from memory - with and without conditional
+ * requests - and measures requests per second and bytes transferred
+ * for the static files.
+ *
+ * Usage: node bench_static.js [durationSeconds] [concurrency]
+ */
+
+const http = require('http');
+const path = require('path');
+const { spawn } = require('child_process');
+
+const DURATION = (parseInt(process.argv[2], 10) || 5) * 1000;
+const CONCURRENCY = parseInt(process.argv[3], 10) || 32;
+const BASE_PORT = 3100;
+
+const ASSETS = ['/', '/src/css/styles.css', '/src/js/util.js', '/src/js/app.js'];
+
+// Start server.js on the given port and wait until it accepts connections
+function startServer(port, preload) {
+    const child = spawn(process.execPath, [path.join(__dirname, 'server.js')], {
+        cwd: __dirname,
+        env: Object.assign({}, process.env, { PORT: String(port), STATIC_PRELOAD: preload ? '1' : '0' }),
+        stdio: 'ignore'
+    });
+
+    return new Promise((resolve, reject) => {
+        const deadline = Date.now() + 5000;
+        const probe = () => {
+            const req = http.get({ port, path: '/' }, res => {
+                res.resume();
+                res.on('end', () => resolve(child));
+            });
+            req.on('error', () => {
+                if (Date.now() > deadline) {
+                    child.kill();
+                    reject(new Error(`Server on port ${port} did not start`));
+                    return;
+                }
+                setTimeout(probe, 50);
+            });
+        };
+        probe();
+    });
+}
+
+// Make a single request and count the bytes that came over the wire
+function request(agent, port, assetPath, headers) {
+    return new Promise((resolve, reject) => {
+        const req = http.get({ agent, port, path: assetPath, headers }, res => {
+            // Approximate header size from the raw header lines
+            let bytes = res.rawHeaders.reduce((sum, value) => sum + value.length + 2, 0);
+            res.on('data', chunk => {
+                bytes += chunk.length;
+            });
+            res.on('end', () => resolve({ status: res.statusCode, etag: res.headers.etag, bytes }));
+        });
+        req.on('error', reject);
+    });
+}
+
+// Hammer the static assets with CONCURRENCY workers for DURATION ms
+async function run(port, revalidate) {
+    const agent = new http.Agent({ keepAlive: true, maxSockets: CONCURRENCY });
+    const etags = {};
+    const stats = { requests: 0, bytes: 0, notModified: 0 };
+    const deadline = Date.now() + DURATION;
+
+    const worker = async (id) => {
+        let i = id;
+        while (Date.now() < deadline) {
+            const assetPath = ASSETS[i++ % ASSETS.length];
+            const headers = { 'Accept-Encoding': 'gzip, deflate, br' };
+            if (revalidate && etags[assetPath]) {
+                headers['If-None-Match'] = etags[assetPath];
+            }
+
+            const result = await request(agent, port, assetPath, headers);
+            if (result.etag) etags[assetPath] = result.etag;
+            if (result.status === 304) stats.notModified++;
+            stats.requests++;
+            stats.bytes += result.bytes;
+        }
+    };
+
+    const start = Date.now();
+    await Promise.all(Array.from({ length: CONCURRENCY }, (_, id) => worker(id)));
+    const elapsed = (Date.now() - start) / 1000;
+    agent.destroy();
+
+    return {
+        rps: stats.requests / elapsed,
+        bytesPerRequest: stats.bytes / stats.requests,
+        totalBytes: stats.bytes,
+        notModified: stats.notModified,
+        requests: stats.requests
+    };
+}
+
+function report(label, result) {
+    console.log(
+        `${label.padEnd(34)} ${result.rps.toFixed(0).padStart(8)} req/s ` +
+        `${result.bytesPerRequest.toFixed(0).padStart(8)} B/req ` +
+        `${(result.totalBytes / 1024 / 1024).toFixed(1).padStart(8)} MiB total ` +
+        `${String(result.notModified).padStart(7)} x 304`
+    );
+}
+
+async function main() {
+    console.log(`Benchmarking ${ASSETS.join(', ')}`);
+    console.log(`${DURATION / 1000}s per scenario, ${CONCURRENCY} concurrent connections\n`);
+
+    const scenarios = [
+        { label: 'before: disk, uncompressed', preload: false, revalidate: false },
+        { label: 'after: memory, precompressed', preload: true, revalidate: false },
+        { label: 'after: memory, conditional GET', preload: true, revalidate: true }
+    ];
+
+    for (const [i, scenario] of scenarios.entries()) {
+        const port = BASE_PORT + i;
+        const child = await startServer(port, scenario.preload);
+        try {
+            report(scenario.label, await run(port, scenario.revalidate));
+        } finally {
+            child.kill();
+        }
+    }
+}
+
+main().catch(error => {
+    console.error('Benchmark failed:', error);
+    process.exit(1);
+});
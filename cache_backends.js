@@ -0,0 +1,490 @@
+/**
+ * Cache backends for the API proxy
+ *
+ * Every backend exposes the same promise-based interface:
+ *   get(key), getEntry(key), put(key, data, ttl), clear(), getGeneration(),
+ *   getStats()
+ *
+ * getEntry resolves with { data, ttl } where ttl is the remaining lifetime in
+ * milliseconds (null if unknown), or null on a miss.
+ *
+ * - MemoryCacheBackend: private to one process
+ * - FileCacheBackend: shared by every process on the host through a directory
+ * - HttpCacheBackend: shared over the network through cache_server.js
+ *
+ * TieredCache puts a small in-process L1 in front of a shared L2. Clearing
+ * the L2 changes its generation value; each replica polls the generation and
+ * drops its L1 when it changes, so a clear on one replica reaches all of them.
+ */
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const http = require('http');
+const https = require('https');
+const crypto = require('crypto');
+
+// Default TTL is 1 hour (in milliseconds)
+const DEFAULT_TTL = 60 * 60 * 1000;
+
+// Count active and expired entries from a list of expiry timestamps
+function countExpiry(expiries) {
+    const now = Date.now();
+    const expired = expiries.filter(expiry => now > expiry).length;
+    return {
+        total: expiries.length,
+        active: expiries.length - expired,
+        expired
+    };
+}
+
+// Base class: backends implement getEntry and inherit get
+class CacheBackend {
+    async get(key) {
+        const entry = await this.getEntry(key);
+        return entry ? entry.data : null;
+    }
+}
+
+// Cache private to this process
+class MemoryCacheBackend extends CacheBackend {
+    constructor(options = {}) {
+        super();
+        this.defaultTTL = options.defaultTTL ?? DEFAULT_TTL;
+        // Least recently used entries are evicted once this many are stored,
+        // or once the stored values add up to more than maxBytes
+        this.maxEntries = options.maxEntries ?? Infinity;
+        this.maxBytes = options.maxBytes ?? Infinity;
+        // Map iteration order doubles as least-recently-used order
+        this.cache = new Map();
+        this.bytes = 0;
+        this.generation = 0;
+        this.evictions = 0;
+    }
+
+    async getEntry(key) {
+        const item = this.cache.get(key);
+        if (!item) return null;
+
+        // Check if the item has expired
+        const now = Date.now();
+        if (now > item.expiry) {
+            this.remove(key);
+            return null;
+        }
+
+        // Move the entry to the most recently used end
+        this.cache.delete(key);
+        this.cache.set(key, item);
+        return { data: item.data, ttl: item.expiry - now };
+    }
+
+    async put(key, data, ttl = this.defaultTTL) {
+        this.remove(key);
+        const size = Buffer.byteLength(data);
+        if (this.maxEntries <= 0 || size > this.maxBytes) return;
+
+        this.sweep();
+        while (this.cache.size >= this.maxEntries || this.bytes + size > this.maxBytes) {
+            this.remove(this.cache.keys().next().value);
+            this.evictions++;
+        }
+
+        this.cache.set(key, {
+            data: data,
+            size,
+            expiry: Date.now() + ttl
+        });
+        this.bytes += size;
+    }
+
+    remove(key) {
+        const item = this.cache.get(key);
+        if (item) {
+            this.cache.delete(key);
+            this.bytes -= item.size;
+        }
+    }
+
+    // Drop every expired entry
+    sweep() {
+        const now = Date.now();
+        for (const [key, item] of this.cache) {
+            if (now > item.expiry) {
+                this.remove(key);
+            }
+        }
+    }
+
+    async clear() {
+        this.cache.clear();
+        this.bytes = 0;
+        this.generation++;
+    }
+
+    async getGeneration() {
+        return this.generation;
+    }
+
+    async getStats() {
+        const expiries = Array.from(this.cache.values(), item => item.expiry);
+        return Object.assign({ backend: 'memory' }, countExpiry(expiries), {
+            bytes: this.bytes,
+            maxEntries: Number.isFinite(this.maxEntries) ? this.maxEntries : null,
+            maxBytes: Number.isFinite(this.maxBytes) ? this.maxBytes : null,
+            evictions: this.evictions
+        });
+    }
+}
+
+// Cache shared by every process on the host, one JSON file per entry
+class FileCacheBackend extends CacheBackend {
+    constructor(options = {}) {
+        super();
+        this.defaultTTL = options.defaultTTL ?? DEFAULT_TTL;
+        this.dir = options.dir || path.join(os.tmpdir(), 'recommender-cache');
+        this.generationFile = path.join(this.dir, 'generation');
+        // How often put() sweeps expired entries out of the directory
+        this.sweepInterval = options.sweepInterval ?? 60 * 1000;
+        this.lastSweep = 0;
+        fs.mkdirSync(this.dir, { recursive: true });
+    }
+
+    // Keys are hashed so any string maps to a safe file name
+    entryPath(key) {
+        const name = crypto.createHash('sha256').update(key).digest('hex');
+        return path.join(this.dir, `${name}.json`);
+    }
+
+    // Write to a temporary file and rename so readers never see partial data
+    async writeAtomic(filePath, contents) {
+        const tmpPath = `${filePath}.${process.pid}.${crypto.randomBytes(4).toString('hex')}.tmp`;
+        await fs.promises.writeFile(tmpPath, contents);
+        await fs.promises.rename(tmpPath, filePath);
+    }
+
+    async listEntries() {
+        const files = await fs.promises.readdir(this.dir);
+        return files.filter(file => file.endsWith('.json')).map(file => path.join(this.dir, file));
+    }
+
+    async getEntry(key) {
+        const filePath = this.entryPath(key);
+        let item;
+        try {
+            item = JSON.parse(await fs.promises.readFile(filePath, 'utf8'));
+        } catch (error) {
+            // Missing or half-deleted entries are plain misses
+            return null;
+        }
+
+        const now = Date.now();
+        if (now > item.expiry) {
+            await fs.promises.rm(filePath, { force: true });
+            return null;
+        }
+
+        return { data: item.data, ttl: item.expiry - now };
+    }
+
+    async put(key, data, ttl = this.defaultTTL) {
+        await this.writeAtomic(this.entryPath(key), JSON.stringify({
+            data: data,
+            expiry: Date.now() + ttl
+        }));
+
+        if (Date.now() - this.lastSweep >= this.sweepInterval) {
+            this.lastSweep = Date.now();
+            await this.sweep();
+        }
+    }
+
+    // Delete entries that have expired, even if they are never read again
+    async sweep() {
+        const now = Date.now();
+        for (const filePath of await this.listEntries()) {
+            try {
+                if (now > JSON.parse(await fs.promises.readFile(filePath, 'utf8')).expiry) {
+                    await fs.promises.rm(filePath, { force: true });
+                }
+            } catch (error) {
+                // Entry was removed or replaced while we were sweeping
+            }
+        }
+    }
+
+    async clear() {
+        const entries = await this.listEntries();
+        await Promise.all(entries.map(filePath => fs.promises.rm(filePath, { force: true })));
+        // A random token rather than a counter, so concurrent clears from
+        // several processes can never write the same value
+        await this.writeAtomic(this.generationFile, crypto.randomUUID());
+    }
+
+    async getGeneration() {
+        try {
+            return (await fs.promises.readFile(this.generationFile, 'utf8')).trim();
+        } catch (error) {
+            return '';
+        }
+    }
+
+    async getStats() {
+        const expiries = [];
+        for (const filePath of await this.listEntries()) {
+            try {
+                expiries.push(JSON.parse(await fs.promises.readFile(filePath, 'utf8')).expiry);
+            } catch (error) {
+                // Entry was removed while we were reading the directory
+            }
+        }
+        return Object.assign({ backend: 'file', dir: this.dir }, countExpiry(expiries));
+    }
+}
+
+// Cache shared over the network through the key-value API of cache_server.js
+class HttpCacheBackend extends CacheBackend {
+    constructor(options = {}) {
+        super();
+        this.defaultTTL = options.defaultTTL ?? DEFAULT_TTL;
+        this.baseUrl = new URL(options.url || 'http://127.0.0.1:6380');
+        this.timeout = options.timeout ?? 500;
+        // Shared secret sent to cache servers started with CACHE_TOKEN
+        this.token = options.token || null;
+        this.transport = this.baseUrl.protocol === 'https:' ? https : http;
+        this.agent = new this.transport.Agent({ keepAlive: true });
+    }
+
+    // Make a request to the cache server and resolve with { status, headers, body }
+    request(method, pathname, body = null, headers = {}) {
+        if (this.token) {
+            headers = Object.assign({ 'X-Cache-Token': this.token }, headers);
+        }
+
+        return new Promise((resolve, reject) => {
+            const req = this.transport.request(new URL(pathname, this.baseUrl), {
+                method,
+                headers,
+                agent: this.agent,
+                timeout: this.timeout
+            }, res => {
+                let data = '';
+                res.setEncoding('utf8');
+                res.on('data', chunk => {
+                    data += chunk;
+                });
+                res.on('end', () => resolve({ status: res.statusCode, headers: res.headers, body: data }));
+            });
+
+            req.on('timeout', () => req.destroy(new Error(`Cache server timed out after ${this.timeout}ms`)));
+            req.on('error', reject);
+            req.end(body);
+        });
+    }
+
+    async getEntry(key) {
+        const response = await this.request('GET', `/cache/${encodeURIComponent(key)}`);
+        if (response.status === 404) return null;
+        if (response.status !== 200) {
+            throw new Error(`Cache server returned ${response.status}`);
+        }
+
+        // The server reports the remaining lifetime in X-Cache-TTL
+        const ttl = parseInt(response.headers['x-cache-ttl'], 10);
+        return { data: response.body, ttl: Number.isNaN(ttl) ? null : ttl };
+    }
+
+    async put(key, data, ttl = this.defaultTTL) {
+        const response = await this.request('PUT', `/cache/${encodeURIComponent(key)}`, data, {
+            'Content-Type': 'text/plain; charset=utf-8',
+            'X-Cache-TTL': String(ttl)
+        });
+        if (response.status !== 204) {
+            throw new Error(`Cache server returned ${response.status}`);
+        }
+    }
+
+    async clear() {
+        const response = await this.request('DELETE', '/cache');
+        if (response.status !== 200) {
+            throw new Error(`Cache server returned ${response.status}`);
+        }
+    }
+
+    async getGeneration() {
+        const response = await this.request('GET', '/generation');
+        if (response.status !== 200) {
+            throw new Error(`Cache server returned ${response.status}`);
+        }
+        return JSON.parse(response.body).generation;
+    }
+
+    async getStats() {
+        const response = await this.request('GET', '/stats');
+        if (response.status !== 200) {
+            throw new Error(`Cache server returned ${response.status}`);
+        }
+        return Object.assign({ backend: 'http', url: this.baseUrl.href }, JSON.parse(response.body));
+    }
+}
+
+// Small in-process L1 in front of a shared L2
+class TieredCache extends CacheBackend {
+    constructor(l1, l2, options = {}) {
+        super();
+        this.l1 = l1;
+        this.l2 = l2;
+        this.defaultTTL = options.defaultTTL ?? DEFAULT_TTL;
+        // L1 entries are kept briefly so other replicas' writes show up soon;
+        // 0 disables the L1
+        this.l1TTL = options.l1TTL ?? 30 * 1000;
+        // How often to check the L2 generation for clears from other replicas
+        this.syncInterval = options.syncInterval ?? 1000;
+        this.generation = null;
+        this.lastSync = 0;
+        this.pendingSync = null;
+        this.hits = { l1: 0, l2: 0 };
+        this.misses = 0;
+    }
+
+    // Drop the L1 if another replica has cleared the shared L2
+    async sync() {
+        // Share one generation lookup between concurrent requests
+        if (this.pendingSync) return this.pendingSync;
+        if (Date.now() - this.lastSync < this.syncInterval) return;
+
+        // Also rate-limits retries while the L2 is unreachable
+        this.lastSync = Date.now();
+        this.pendingSync = this.l2.getGeneration().then(async generation => {
+            if (this.generation !== null && generation !== this.generation) {
+                await this.l1.clear();
+            }
+            this.generation = generation;
+        }).finally(() => {
+            this.pendingSync = null;
+        });
+
+        return this.pendingSync;
+    }
+
+    async getEntry(key) {
+        try {
+            await this.sync();
+        } catch (error) {
+            console.warn('Could not check shared cache generation:', error.message);
+        }
+
+        const local = await this.l1.getEntry(key);
+        if (local !== null) {
+            this.hits.l1++;
+            return local;
+        }
+
+        let shared = null;
+        try {
+            shared = await this.l2.getEntry(key);
+        } catch (error) {
+            console.warn('Shared cache read failed:', error.message);
+        }
+
+        if (shared === null) {
+            this.misses++;
+            return null;
+        }
+
+        this.hits.l2++;
+        // Never keep the L1 copy past the L2 entry's own expiry
+        const ttl = shared.ttl === null ? this.l1TTL : Math.min(this.l1TTL, shared.ttl);
+        if (ttl > 0) {
+            await this.l1.put(key, shared.data, ttl);
+        }
+        return shared;
+    }
+
+    async put(key, data, ttl = this.defaultTTL) {
+        if (this.l1TTL > 0) {
+            await this.l1.put(key, data, Math.min(ttl, this.l1TTL));
+        }
+        try {
+            await this.l2.put(key, data, ttl);
+        } catch (error) {
+            console.warn('Shared cache write failed:', error.message);
+        }
+    }
+
+    async clear() {
+        // Drop the local copy first so it goes even if the L2 is unreachable
+        await this.l1.clear();
+        // Force the next read to pick up the new generation
+        this.lastSync = 0;
+        await this.l2.clear();
+    }
+
+    async getGeneration() {
+        return this.l2.getGeneration();
+    }
+
+    async getStats() {
+        return {
+            backend: 'tiered',
+            hits: Object.assign({}, this.hits),
+            misses: this.misses,
+            l1: await this.l1.getStats(),
+            l2: await this.l2.getStats()
+        };
+    }
+}
+
+// Read a number from env, falling back to the default if it is missing or invalid
+function envNumber(env, name, fallback) {
+    const value = env[name];
+    if (value === undefined || value.trim() === '') return fallback;
+
+    const parsed = Number(value);
+    if (Number.isNaN(parsed)) {
+        console.warn(`Ignoring invalid ${name} "${value}", using ${fallback}`);
+        return fallback;
+    }
+    return parsed;
+}
+
+// Build the cache described by CACHE_* environment variables
+function createCacheFromEnv(env = process.env) {
+    const backend = (env.CACHE_BACKEND || 'memory').toLowerCase();
+    const memoryOptions = {
+        maxEntries: envNumber(env, 'CACHE_L1_MAX_ENTRIES', 1000)
+    };
+    const tierOptions = {
+        l1TTL: envNumber(env, 'CACHE_L1_TTL', 30) * 1000,
+        syncInterval: envNumber(env, 'CACHE_SYNC_INTERVAL', 1) * 1000
+    };
+
+    switch (backend) {
+        case 'memory':
+            return new MemoryCacheBackend(memoryOptions);
+        case 'file':
+            return new TieredCache(
+                new MemoryCacheBackend(memoryOptions),
+                new FileCacheBackend({ dir: env.CACHE_DIR }),
+                tierOptions
+            );
+        case 'http':
+            return new TieredCache(
+                new MemoryCacheBackend(memoryOptions),
+                new HttpCacheBackend({ url: env.CACHE_URL, token: env.CACHE_TOKEN }),
+                tierOptions
+            );
+        default:
+            throw new Error(`Unknown CACHE_BACKEND "${env.CACHE_BACKEND}" (expected memory, file or http)`);
+    }
+}
+
+module.exports = {
+    DEFAULT_TTL,
+    CacheBackend,
+    MemoryCacheBackend,
+    FileCacheBackend,
+    HttpCacheBackend,
+    TieredCache,
+    createCacheFromEnv
+};
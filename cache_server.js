@@ -0,0 +1,168 @@
+/**
+ * Shared key-value cache server
+ *
+ * A small networked cache that several server.js replicas (and the Python
+ * client) can share via CACHE_BACKEND=http. Also serves as the local
+ * stand-in server for testing the networked backend.
+ *
+ * API:
+ *   GET    /cache/:key   -> 200 with the stored value and its remaining TTL in
+ *                           milliseconds in X-Cache-TTL, or 404
+ *   PUT    /cache/:key   -> 204; TTL in milliseconds from the X-Cache-TTL header,
+ *                           413 if the value exceeds CACHE_SERVER_MAX_BODY bytes
+ *   DELETE /cache        -> 200; clears every entry and bumps the generation
+ *   GET    /generation   -> 200 { generation }
+ *   GET    /stats        -> 200 { total, active, expired, bytes, limits, generation }
+ *
+ * Every request must carry an X-Cache-Token header matching CACHE_TOKEN when
+ * that is set; otherwise the server answers 401.
+ *
+ * Usage: CACHE_SERVER_PORT=6380 node cache_server.js
+ */
+
+const http = require('http');
+const url = require('url');
+const crypto = require('crypto');
+const { MemoryCacheBackend } = require('./cache_backends');
+
+// Port and interface to listen on; only local clients by default
+const PORT = process.env.CACHE_SERVER_PORT || 6380;
+const HOST = process.env.CACHE_SERVER_HOST || '127.0.0.1';
+
+// Optional shared secret required from every client
+const TOKEN = process.env.CACHE_TOKEN || null;
+
+// Largest value accepted in a PUT (default 5 MiB)
+const MAX_BODY_SIZE = parseInt(process.env.CACHE_SERVER_MAX_BODY, 10) || 5 * 1024 * 1024;
+
+// Limits on what the shared store may hold (defaults: 10000 entries, 256 MiB)
+const MAX_ENTRIES = parseInt(process.env.CACHE_SERVER_MAX_ENTRIES, 10) || 10000;
+const MAX_BYTES = parseInt(process.env.CACHE_SERVER_MAX_BYTES, 10) || 256 * 1024 * 1024;
+
+// How often to drop expired entries, in seconds
+const SWEEP_INTERVAL = parseInt(process.env.CACHE_SERVER_SWEEP_INTERVAL, 10) || 60;
+
+const store = new MemoryCacheBackend({ maxEntries: MAX_ENTRIES, maxBytes: MAX_BYTES });
+
+function sendJson(res, status, data) {
+    res.writeHead(status, { 'Content-Type': 'application/json' });
+    res.end(JSON.stringify(data));
+}
+
+// Check the X-Cache-Token header against TOKEN in constant time
+function isAuthorized(req) {
+    if (!TOKEN) return true;
+
+    const expected = Buffer.from(TOKEN);
+    const given = Buffer.from(req.headers['x-cache-token'] || '');
+    return given.length === expected.length && crypto.timingSafeEqual(given, expected);
+}
+
+// Read a request body, rejecting with status 413 once it exceeds MAX_BODY_SIZE
+function readBody(req) {
+    return new Promise((resolve, reject) => {
+        const tooLarge = () => Object.assign(new Error('Entry too large'), { status: 413 });
+        if (parseInt(req.headers['content-length'], 10) > MAX_BODY_SIZE) {
+            reject(tooLarge());
+            return;
+        }
+
+        const chunks = [];
+        let size = 0;
+        req.on('data', chunk => {
+            size += chunk.length;
+            if (size > MAX_BODY_SIZE) {
+                // Stop buffering and discard the rest of the upload
+                req.removeAllListeners('data');
+                req.resume();
+                reject(tooLarge());
+                return;
+            }
+            chunks.push(chunk);
+        });
+        req.on('end', () => resolve(Buffer.concat(chunks).toString('utf8')));
+        req.on('error', reject);
+    });
+}
+
+// Create the server
+const server = http.createServer(async (req, res) => {
+    const pathname = url.parse(req.url).pathname;
+
+    if (!isAuthorized(req)) {
+        sendJson(res, 401, { error: 'Missing or invalid cache token' });
+        return;
+    }
+
+    try {
+        if (pathname.startsWith('/cache/')) {
+            const key = decodeURIComponent(pathname.slice('/cache/'.length));
+
+            if (req.method === 'GET') {
+                const entry = await store.getEntry(key);
+                if (entry === null) {
+                    res.writeHead(404);
+                    res.end();
+                    return;
+                }
+                res.writeHead(200, {
+                    'Content-Type': 'text/plain; charset=utf-8',
+                    'X-Cache-TTL': String(entry.ttl)
+                });
+                res.end(entry.data);
+                return;
+            }
+
+            if (req.method === 'PUT') {
+                const body = await readBody(req);
+                const ttl = parseInt(req.headers['x-cache-ttl'], 10);
+                await store.put(key, body, Number.isNaN(ttl) ? undefined : ttl);
+                res.writeHead(204);
+                res.end();
+                return;
+            }
+        }
+
+        if (pathname === '/cache' && req.method === 'DELETE') {
+            await store.clear();
+            sendJson(res, 200, { generation: await store.getGeneration() });
+            return;
+        }
+
+        if (pathname === '/generation' && req.method === 'GET') {
+            sendJson(res, 200, { generation: await store.getGeneration() });
+            return;
+        }
+
+        if (pathname === '/stats' && req.method === 'GET') {
+            const stats = await store.getStats();
+            delete stats.backend;
+            stats.generation = await store.getGeneration();
+            sendJson(res, 200, stats);
+            return;
+        }
+
+        sendJson(res, 404, { error: 'Not found' });
+    } catch (error) {
+        if (error.status === 413) {
+            res.setHeader('Connection', 'close');
+            sendJson(res, 413, { error: `Entry exceeds ${MAX_BODY_SIZE} bytes` });
+            return;
+        }
+        console.error('Cache server error:', error);
+        if (!res.headersSent) {
+            sendJson(res, 500, { error: 'Internal cache server error' });
+        }
+    }
+});
+
+// Drop expired entries even if they are never read again
+setInterval(() => store.sweep(), SWEEP_INTERVAL * 1000).unref();
+
+// Start the server
+server.listen(PORT, HOST, () => {
+    console.log(`Cache server running at http://${HOST}:${PORT}/`);
+    if (!TOKEN) {
+        console.log('No CACHE_TOKEN set; any client that can reach this address can use the cache');
+    }
+});
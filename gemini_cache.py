@@ -0,0 +1,428 @@
+"""
+Pluggable response cache for the Python Gemini scripts
+
+Every backend exposes the same interface as the Node.js proxy's cache:
+get(key), get_entry(key), put(key, data, ttl), clear(), get_generation() and
+get_stats().
+
+- MemoryCache: private to one process
+- SQLiteCache: shared by every process on the host through a SQLite file
+- HTTPCache: shared over the network through cache_server.js
+
+TieredCache puts a small in-process L1 in front of a shared L2. Clearing the
+L2 changes its generation; every replica polls the generation and drops
+its L1 when it changes, so a clear anywhere (including the proxy's
+/api/cache-clear when both use CACHE_BACKEND=http) reaches all of them.
+
+Select a backend with the CACHE_BACKEND environment variable (memory, sqlite
+or http) and use create_cache_from_env().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Default TTL is 1 hour (in seconds)
+DEFAULT_TTL = 60 * 60
+
+
+def generate_key(data):
+    """Generate a cache key from JSON-serialisable request data"""
+    return hashlib.md5(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _count_expiry(expiries):
+    """Count active and expired entries from a list of expiry timestamps"""
+    now = time.time()
+    expired = sum(1 for expiry in expiries if now > expiry)
+    return {"total": len(expiries), "active": len(expiries) - expired, "expired": expired}
+
+
+class CacheBackend(ABC):
+    """Interface shared by all cache backends"""
+
+    def get(self, key):
+        """Return the cached string for key, or None if missing or expired"""
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    @abstractmethod
+    def get_entry(self, key):
+        """Return (data, remaining TTL in seconds or None if unknown), or None on a miss"""
+
+    @abstractmethod
+    def put(self, key, data, ttl=DEFAULT_TTL):
+        """Store a string under key for ttl seconds"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every entry and change the generation"""
+
+    @abstractmethod
+    def get_generation(self):
+        """Return a value that changes every time the cache is cleared"""
+
+    @abstractmethod
+    def get_stats(self):
+        """Return a dict with total, active and expired entry counts"""
+
+
+class MemoryCache(CacheBackend):
+    """Cache private to this process"""
+
+    def __init__(self, max_entries=None):
+        """
+        Args:
+            max_entries: Least recently used entries are evicted once this many are stored
+                (None for no limit)
+        """
+        self.max_entries = max_entries
+        # Insertion order doubles as least-recently-used order
+        self._cache = OrderedDict()
+        self._generation = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get_entry(self, key):
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                return None
+
+            data, expiry = item
+            now = time.time()
+            if now > expiry:
+                del self._cache[key]
+                return None
+
+            self._cache.move_to_end(key)
+            return data, expiry - now
+
+    def put(self, key, data, ttl=DEFAULT_TTL):
+        with self._lock:
+            if self.max_entries is not None and self.max_entries <= 0:
+                return
+
+            self._cache.pop(key, None)
+            self._sweep()
+            while self.max_entries is not None and len(self._cache) >= self.max_entries:
+                self._cache.popitem(last=False)
+                self._evictions += 1
+
+            self._cache[key] = (data, time.time() + ttl)
+
+    def _sweep(self):
+        """Drop every expired entry; the caller holds the lock"""
+        now = time.time()
+        for key in [key for key, (_, expiry) in self._cache.items() if now > expiry]:
+            del self._cache[key]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._generation += 1
+
+    def get_generation(self):
+        return self._generation
+
+    def get_stats(self):
+        with self._lock:
+            expiries = [expiry for _, expiry in self._cache.values()]
+        return {
+            "backend": "memory",
+            **_count_expiry(expiries),
+            "max_entries": self.max_entries,
+            "evictions": self._evictions,
+        }
+
+
+class SQLiteCache(CacheBackend):
+    """Cache shared by every process on the host through a SQLite database"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(tempfile.gettempdir(), "recommender-cache.sqlite3")
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, data TEXT NOT NULL, expiry REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS cache_expiry ON cache (expiry)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('generation', 0)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # A connection per call keeps the backend safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _run(self, query, params=()):
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+    def get_entry(self, key):
+        rows = self._run("SELECT data, expiry FROM cache WHERE key = ?", (key,))
+        if not rows:
+            return None
+
+        data, expiry = rows[0]
+        now = time.time()
+        if now > expiry:
+            self._run("DELETE FROM cache WHERE key = ? AND expiry = ?", (key, expiry))
+            return None
+
+        return data, expiry - now
+
+    def put(self, key, data, ttl=DEFAULT_TTL):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                # Expired rows would otherwise stay until their key is read again
+                conn.execute("DELETE FROM cache WHERE expiry < ?", (now,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, data, expiry) VALUES (?, ?, ?)",
+                    (key, data, now + ttl),
+                )
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM cache")
+                conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'generation'")
+        finally:
+            conn.close()
+
+    def get_generation(self):
+        return self._run("SELECT value FROM meta WHERE name = 'generation'")[0][0]
+
+    def get_stats(self):
+        expiries = [row[0] for row in self._run("SELECT expiry FROM cache")]
+        return {"backend": "sqlite", "path": self.path, **_count_expiry(expiries)}
+
+
+class HTTPCache(CacheBackend):
+    """Cache shared over the network through the key-value API of cache_server.js"""
+
+    def __init__(self, url=None, timeout=0.5, token=None):
+        """
+        Args:
+            url: Base URL of cache_server.js
+            timeout: Seconds to wait for each request
+            token: Shared secret for cache servers started with CACHE_TOKEN
+        """
+        self.url = (url or "http://127.0.0.1:6380").rstrip("/")
+        self.timeout = timeout
+        self.token = token
+
+    def _request(self, method, path, data=None, headers=None):
+        """Make a request to the cache server and return (status, headers, body)"""
+        headers = dict(headers or {})
+        if self.token:
+            headers["X-Cache-Token"] = self.token
+        request = urllib.request.Request(self.url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.headers, response.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read().decode("utf-8")
+
+    def _key_path(self, key):
+        return "/cache/" + urllib.parse.quote(key, safe="")
+
+    def get_entry(self, key):
+        status, headers, body = self._request("GET", self._key_path(key))
+        if status == 404:
+            return None
+        if status != 200:
+            raise RuntimeError(f"Cache server returned {status}")
+
+        # The server reports the remaining lifetime in milliseconds in X-Cache-TTL
+        try:
+            ttl = int(headers.get("X-Cache-TTL")) / 1000
+        except (TypeError, ValueError):
+            ttl = None
+        return body, ttl
+
+    def put(self, key, data, ttl=DEFAULT_TTL):
+        # The cache server takes TTLs in milliseconds, like the Node.js proxy
+        status, _, _ = self._request(
+            "PUT",
+            self._key_path(key),
+            data=data.encode("utf-8"),
+            headers={"Content-Type": "text/plain; charset=utf-8", "X-Cache-TTL": str(int(ttl * 1000))},
+        )
+        if status != 204:
+            raise RuntimeError(f"Cache server returned {status}")
+
+    def clear(self):
+        status, _, _ = self._request("DELETE", "/cache")
+        if status != 200:
+            raise RuntimeError(f"Cache server returned {status}")
+
+    def get_generation(self):
+        status, _, body = self._request("GET", "/generation")
+        if status != 200:
+            raise RuntimeError(f"Cache server returned {status}")
+        return json.loads(body)["generation"]
+
+    def get_stats(self):
+        status, _, body = self._request("GET", "/stats")
+        if status != 200:
+            raise RuntimeError(f"Cache server returned {status}")
+        return {"backend": "http", "url": self.url, **json.loads(body)}
+
+
+class TieredCache(CacheBackend):
+    """Small in-process L1 in front of a shared L2"""
+
+    def __init__(self, l1, l2, l1_ttl=30, sync_interval=1):
+        """
+        Args:
+            l1: Local cache consulted first
+            l2: Shared cache behind it
+            l1_ttl: Seconds to keep entries in the L1 so other replicas' writes show up soon;
+                0 disables the L1
+            sync_interval: Seconds between checks of the L2 generation for clears elsewhere
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.sync_interval = sync_interval
+        self.generation = None
+        self.last_sync = 0
+        self.hits = {"l1": 0, "l2": 0}
+        self.misses = 0
+
+    def _sync(self):
+        """Drop the L1 if another replica has cleared the shared L2"""
+        if time.time() - self.last_sync < self.sync_interval:
+            return
+
+        # Also rate-limits retries while the L2 is unreachable
+        self.last_sync = time.time()
+        generation = self.l2.get_generation()
+        if self.generation is not None and generation != self.generation:
+            self.l1.clear()
+        self.generation = generation
+
+    def get_entry(self, key):
+        try:
+            self._sync()
+        except Exception as e:
+            logger.warning("Could not check shared cache generation: %s", e)
+
+        entry = self.l1.get_entry(key)
+        if entry is not None:
+            self.hits["l1"] += 1
+            return entry
+
+        try:
+            entry = self.l2.get_entry(key)
+        except Exception as e:
+            logger.warning("Shared cache read failed: %s", e)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits["l2"] += 1
+        # Never keep the L1 copy past the L2 entry's own expiry
+        data, remaining = entry
+        ttl = self.l1_ttl if remaining is None else min(self.l1_ttl, remaining)
+        if ttl > 0:
+            self.l1.put(key, data, ttl)
+        return entry
+
+    def put(self, key, data, ttl=DEFAULT_TTL):
+        if self.l1_ttl > 0:
+            self.l1.put(key, data, min(ttl, self.l1_ttl))
+        try:
+            self.l2.put(key, data, ttl)
+        except Exception as e:
+            logger.warning("Shared cache write failed: %s", e)
+
+    def clear(self):
+        # Drop the local copy first so it goes even if the L2 is unreachable
+        self.l1.clear()
+        # Force the next read to pick up the new generation
+        self.last_sync = 0
+        self.l2.clear()
+
+    def get_generation(self):
+        return self.l2.get_generation()
+
+    def get_stats(self):
+        return {
+            "backend": "tiered",
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "l1": self.l1.get_stats(),
+            "l2": self.l2.get_stats(),
+        }
+
+
+def _env_number(env, name, default):
+    """Read a number from env, falling back to default if it is missing or invalid"""
+    value = env.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning('Ignoring invalid %s "%s", using %s', name, value, default)
+        return default
+
+
+def create_cache_from_env(env=None):
+    """
+    Build the cache described by CACHE_* environment variables
+
+    Args:
+        env: Mapping to read settings from (defaults to os.environ)
+
+    Returns:
+        A CacheBackend instance
+
+    Raises:
+        ValueError: If CACHE_BACKEND names an unknown backend
+    """
+    env = os.environ if env is None else env
+    backend = env.get("CACHE_BACKEND", "memory").lower()
+    max_entries = int(_env_number(env, "CACHE_L1_MAX_ENTRIES", 1000))
+    tier_options = {
+        "l1_ttl": _env_number(env, "CACHE_L1_TTL", 30),
+        "sync_interval": _env_number(env, "CACHE_SYNC_INTERVAL", 1),
+    }
+
+    if backend == "memory":
+        return MemoryCache(max_entries)
+    if backend == "sqlite":
+        return TieredCache(MemoryCache(max_entries), SQLiteCache(env.get("CACHE_DB")), **tier_options)
+    if backend == "http":
+        return TieredCache(MemoryCache(max_entries), HTTPCache(env.get("CACHE_URL"), token=env.get("CACHE_TOKEN")), **tier_options)
+
+    raise ValueError(f'Unknown CACHE_BACKEND "{backend}" (expected memory, sqlite or http)')
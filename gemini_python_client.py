@@ -5,6 +5,7 @@ Python script to interact with Google's Gemini models using the official Python
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv  # This requires installation: pip install python-dotenv
+from gemini_cache import create_cache_from_env, generate_key
 
 # Load environment variables from .env file (we can reuse our existing API key)
 load_dotenv()
@@ -12,6 +13,14 @@ load_dotenv()
 # Configure the generative AI client with your API key
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
+# Response cache; CACHE_BACKEND selects memory, sqlite or http
+try:
+    cache = create_cache_from_env()
+except ValueError as e:
+    print(f"ERROR: {e}")
+    print("Please fix the CACHE_BACKEND setting in your environment or .env file")
+    exit(1)
+
 def generate_story():
     """Generate a short story using Gemini 2.0 Flash"""
     try:
@@ -51,12 +60,20 @@ Please provide a curated list of 10 movie recommendations that match these prefe
 
 Format each recommendation in a clean, consistent way without using markdown or special formatting."""
         
-        # Generate content
-        response = client.generate_content(prompt)
+        # Reuse a cached response for identical prompts
+        cache_key = generate_key({"model": "gemini-2.0-flash", "prompt": prompt})
+        text = cache.get(cache_key)
+        if text is None:
+            # Generate content
+            response = client.generate_content(prompt)
+            text = response.text
+            cache.put(cache_key, text)
+        else:
+            print("\n(Using cached recommendations)")
         
         # Print the response text
         print("\n----- MOVIE RECOMMENDATIONS -----\n")
-        print(response.text)
+        print(text)
         print("\n----- END OF RECOMMENDATIONS -----\n")
         
     except Exception as e:
@@ -4,83 +4,211 @@ const fs = require('fs');
 const path = require('path');
 const url = require('url');
 const crypto = require('crypto');
+const zlib = require('zlib');
+const { createCacheFromEnv } = require('./cache_backends');
 
 // Port to listen on
-const PORT = 3000;
+const PORT = process.env.PORT || 3000;
 
-// In-memory cache for API responses
-const apiCache = {
-    cache: {},
-    // Default TTL is 1 hour (in milliseconds)
-    defaultTTL: 60 * 60 * 1000,
+// Base URL of the Gemini API; override to point the proxy at a stand-in
+const GEMINI_API_URL = new URL(process.env.GEMINI_API_URL || 'https://generativelanguage.googleapis.com');
+
+// Cache for API responses; CACHE_BACKEND selects memory, file or http
+let apiCache;
+try {
+    apiCache = createCacheFromEnv();
+} catch (error) {
+    console.error(`ERROR: ${error.message}`);
+    process.exit(1);
+}
+
+// Generate a cache key from the request data
+function generateCacheKey(data) {
+    return crypto.createHash('md5').update(JSON.stringify(data)).digest('hex');
+}
+
+// MIME types for file extensions
+const MIME_TYPES = {
+    '.html': 'text/html',
+    '.css': 'text/css',
+    '.js': 'text/javascript',
+    '.json': 'application/json',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+    '.ico': 'image/x-icon',
+    '.txt': 'text/plain'
+};
+
+// Only these content types are worth compressing
+const COMPRESSIBLE_TYPES = [
+    'text/html',
+    'text/css',
+    'text/javascript',
+    'application/json',
+    'image/svg+xml',
+    'text/plain'
+];
+
+// Static assets preloaded into memory at startup. Set STATIC_PRELOAD=0 to
+// fall back to reading every file from disk on each request.
+const staticAssets = {
+    files: ['/src/css/styles.css', '/src/js/util.js', '/src/js/app.js', '/favicon.ico', '/index.html'],
+    enabled: process.env.STATIC_PRELOAD !== '0',
+    assets: {},
+    // Original path -> fingerprinted path (e.g. /src/js/app.1a2b3c4d.js)
+    fingerprints: {},
     
-    // Get an item from the cache
-    get: function(key) {
-        const item = this.cache[key];
-        if (!item) return null;
+    // Read, fingerprint and precompress every file in the list
+    load: function() {
+        if (!this.enabled) return;
         
-        // Check if the item has expired
-        if (Date.now() > item.expiry) {
-            delete this.cache[key];
-            return null;
+        let loaded = 0;
+        for (const file of this.files) {
+            let data;
+            try {
+                data = fs.readFileSync(path.join(__dirname, file));
+            } catch (error) {
+                console.warn(`Could not preload ${file}:`, error.message);
+                continue;
+            }
+            
+            // HTML is preloaded last so it can reference fingerprinted assets
+            if (path.extname(file) === '.html') {
+                data = Buffer.from(this.rewriteReferences(data.toString('utf8')));
+            }
+            
+            const entry = this.createEntry(file, data);
+            this.assets[file] = Object.assign({}, entry, { cacheControl: 'no-cache' });
+            
+            // HTML is the entry point and must always be revalidated
+            if (path.extname(file) !== '.html') {
+                const ext = path.extname(file);
+                const hashedPath = `${file.slice(0, -ext.length)}.${entry.hash.slice(0, 8)}${ext}`;
+                this.fingerprints[file] = hashedPath;
+                this.assets[hashedPath] = Object.assign({}, entry, {
+                    cacheControl: 'public, max-age=31536000, immutable'
+                });
+            }
+            loaded++;
         }
         
-        return item.data;
+        console.log(`Preloaded ${loaded} static assets into memory`);
     },
     
-    // Put an item in the cache
-    put: function(key, data, ttl = this.defaultTTL) {
-        this.cache[key] = {
-            data: data,
-            expiry: Date.now() + ttl
+    // Build the in-memory representation of a single asset
+    createEntry: function(file, data) {
+        const contentType = MIME_TYPES[path.extname(file)] || 'application/octet-stream';
+        const entry = {
+            hash: crypto.createHash('sha256').update(data).digest('hex').slice(0, 16),
+            contentType,
+            identity: data,
+            gzip: null,
+            br: null
         };
+        
+        // Keep compressed variants only when they actually save bytes
+        if (COMPRESSIBLE_TYPES.includes(contentType)) {
+            const gzip = zlib.gzipSync(data, { level: zlib.constants.Z_BEST_COMPRESSION });
+            const br = zlib.brotliCompressSync(data, {
+                params: {
+                    [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+                    [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+                    [zlib.constants.BROTLI_PARAM_SIZE_HINT]: data.length
+                }
+            });
+            if (gzip.length < data.length) entry.gzip = gzip;
+            if (br.length < data.length) entry.br = br;
+        }
+        
+        return entry;
     },
     
-    // Generate a cache key from the request data
-    generateKey: function(data) {
-        return crypto.createHash('md5').update(JSON.stringify(data)).digest('hex');
+    // Point src/href attributes in HTML at the fingerprinted asset paths
+    rewriteReferences: function(html) {
+        for (const file in this.fingerprints) {
+            const hashedPath = this.fingerprints[file];
+            html = html.split(`="${file}"`).join(`="${hashedPath}"`);
+            html = html.split(`="${file.slice(1)}"`).join(`="${hashedPath.slice(1)}"`);
+        }
+        return html;
     },
     
-    // Clear the entire cache
-    clear: function() {
-        this.cache = {};
-    },
+    // Get a preloaded asset by request path
+    get: function(pathname) {
+        return this.assets[pathname] || null;
+    }
+};
+
+// Pick the available encoding with the highest q-value in an Accept-Encoding
+// header. Ties go to the earlier entry in available; null means identity,
+// which is only preferred over compression when the client ranks it higher.
+function negotiateEncoding(header, available) {
+    if (!header) return null;
     
-    // Get cache statistics
-    getStats: function() {
-        const now = Date.now();
-        let active = 0;
-        let expired = 0;
-        
-        for (const key in this.cache) {
-            if (now > this.cache[key].expiry) {
-                expired++;
-            } else {
-                active++;
-            }
+    const weights = {};
+    for (const part of header.split(',')) {
+        const [name, ...params] = part.trim().split(';');
+        const q = params.map(param => param.trim()).find(param => param.startsWith('q='));
+        const weight = q ? parseFloat(q.slice(2)) : 1;
+        weights[name.trim().toLowerCase()] = Number.isNaN(weight) ? 0 : weight;
+    }
+    
+    let best = null;
+    let bestWeight = weights.identity ?? 0;
+    for (const encoding of available) {
+        // A bare * covers every encoding not listed by name
+        const weight = weights[encoding] ?? weights['*'] ?? 0;
+        if (weight > bestWeight) {
+            best = encoding;
+            bestWeight = weight;
         }
-        
-        return {
-            total: Object.keys(this.cache).length,
-            active,
-            expired
-        };
     }
-};
+    return best;
+}
 
-// MIME types for file extensions
-const MIME_TYPES = {
-    '.html': 'text/html',
-    '.css': 'text/css',
-    '.js': 'text/javascript',
-    '.json': 'application/json',
-    '.png': 'image/png',
-    '.jpg': 'image/jpeg',
-    '.gif': 'image/gif',
-    '.svg': 'image/svg+xml',
-    '.ico': 'image/x-icon',
-    '.txt': 'text/plain'
-};
+// Check whether an If-None-Match header matches the asset's content hash
+function matchesETag(header, hash) {
+    if (!header) return false;
+    
+    return header.split(',').some(tag => {
+        tag = tag.trim().replace(/^W\//, '');
+        if (tag === '*') return true;
+        // Compressed variants share the content hash with an encoding suffix
+        return tag.replace(/"/g, '').replace(/-(br|gzip)$/, '') === hash;
+    });
+}
+
+// Serve a preloaded asset from memory
+function serveStaticAsset(req, res, asset) {
+    // Brotli first so it wins ties, as it is the smaller of the two
+    const available = ['br', 'gzip'].filter(encoding => asset[encoding]);
+    const encoding = negotiateEncoding(req.headers['accept-encoding'], available);
+    
+    const headers = {
+        'Content-Type': asset.contentType,
+        'Cache-Control': asset.cacheControl,
+        'ETag': encoding ? `"${asset.hash}-${encoding}"` : `"${asset.hash}"`,
+        'Vary': 'Accept-Encoding'
+    };
+    
+    // Answer conditional requests without resending the body
+    if (matchesETag(req.headers['if-none-match'], asset.hash)) {
+        res.writeHead(304, headers);
+        res.end();
+        return;
+    }
+    
+    const body = encoding ? asset[encoding] : asset.identity;
+    if (encoding) {
+        headers['Content-Encoding'] = encoding;
+    }
+    headers['Content-Length'] = body.length;
+    
+    res.writeHead(200, headers);
+    res.end(req.method === 'HEAD' ? undefined : body);
+}
 
 // Read the API key from .env file
 let apiKey = '';
@@ -123,16 +251,27 @@ const server = http.createServer((req, res) => {
     
     // Handle cache stats endpoint
     if (pathname === '/api/cache-stats' && req.method === 'GET') {
-        res.writeHead(200, { 'Content-Type': 'application/json' });
-        res.end(JSON.stringify(apiCache.getStats()));
+        apiCache.getStats().then(stats => {
+            res.writeHead(200, { 'Content-Type': 'application/json' });
+            res.end(JSON.stringify(stats));
+        }).catch(error => {
+            console.error('Error reading cache stats:', error);
+            res.writeHead(500, { 'Content-Type': 'application/json' });
+            res.end(JSON.stringify({ error: 'Failed to read cache stats' }));
+        });
         return;
     }
     
-    // Handle cache clear endpoint
+    // Handle cache clear endpoint; shared backends propagate it to every replica
     if (pathname === '/api/cache-clear' && req.method === 'POST') {
-        apiCache.clear();
-        res.writeHead(200, { 'Content-Type': 'application/json' });
-        res.end(JSON.stringify({ message: 'Cache cleared successfully' }));
+        apiCache.clear().then(() => {
+            res.writeHead(200, { 'Content-Type': 'application/json' });
+            res.end(JSON.stringify({ message: 'Cache cleared successfully' }));
+        }).catch(error => {
+            console.error('Error clearing shared cache:', error);
+            res.writeHead(500, { 'Content-Type': 'application/json' });
+            res.end(JSON.stringify({ error: 'Local cache cleared, but failed to clear shared cache' }));
+        });
         return;
     }
     
@@ -141,6 +280,13 @@ const server = http.createServer((req, res) => {
         pathname = '/index.html';
     }
     
+    // Serve preloaded assets from memory
+    const asset = staticAssets.get(pathname);
+    if (asset) {
+        serveStaticAsset(req, res, asset);
+        return;
+    }
+    
     // Get the file path
     const filePath = path.join(__dirname, pathname);
     
@@ -178,7 +324,7 @@ function handleApiProxy(req, res) {
         body += chunk.toString();
     });
     
-    req.on('end', () => {
+    req.on('end', async () => {
         // Check if the request has been responded to already
         if (res.headersSent) {
             console.warn('Headers already sent, skipping response');
@@ -196,10 +342,19 @@ function handleApiProxy(req, res) {
         }
         
         // Generate a cache key for this request
-        const cacheKey = apiCache.generateKey(requestData);
+        const cacheKey = generateCacheKey(requestData);
         
         // Check if we have a cached response
-        const cachedResponse = apiCache.get(cacheKey);
+        let cachedResponse = null;
+        try {
+            cachedResponse = await apiCache.get(cacheKey);
+        } catch (error) {
+            console.error('Error reading from cache:', error);
+        }
+        if (res.headersSent) {
+            console.warn('Headers already sent, skipping response');
+            return;
+        }
         if (cachedResponse) {
             console.log('Using cached response for request');
             res.writeHead(200, { 
@@ -213,7 +368,9 @@ function handleApiProxy(req, res) {
         // Prepare the request to the Gemini API
         // Using gemini-2.0-flash model instead of gemini-pro
         const options = {
-            hostname: 'generativelanguage.googleapis.com',
+            protocol: GEMINI_API_URL.protocol,
+            hostname: GEMINI_API_URL.hostname,
+            port: GEMINI_API_URL.port || undefined,
             path: `/v1beta/models/gemini-2.0-flash:generateContent?key=${apiKey}`,
             method: 'POST',
             headers: {
@@ -222,7 +379,8 @@ function handleApiProxy(req, res) {
         };
         
         // Make the request to the Gemini API
-        const apiReq = https.request(options, apiRes => {
+        const transport = GEMINI_API_URL.protocol === 'http:' ? http : https;
+        const apiReq = transport.request(options, apiRes => {
             let responseData = '';
             
             apiRes.on('data', chunk => {
@@ -238,8 +396,11 @@ function handleApiProxy(req, res) {
                 
                 // Cache the response if status is 200
                 if (apiRes.statusCode === 200) {
-                    apiCache.put(cacheKey, responseData);
-                    console.log('Cached response for future requests');
+                    apiCache.put(cacheKey, responseData).then(() => {
+                        console.log('Cached response for future requests');
+                    }).catch(error => {
+                        console.error('Error writing to cache:', error);
+                    });
                 }
                 
                 // Forward the response from the Gemini API
@@ -270,9 +431,13 @@ function handleApiProxy(req, res) {
     });
 }
 
+// Preload static assets before accepting requests
+staticAssets.load();
+
 // Start the server
 server.listen(PORT, () => {
     console.log(`Server running at http://localhost:${PORT}/`);
     console.log(`API proxy available at http://localhost:${PORT}/api/gemini`);
     console.log(`Cache statistics available at http://localhost:${PORT}/api/cache-stats`);
+    console.log(`Using ${process.env.CACHE_BACKEND || 'memory'} cache backend`);
 }); 
\ No newline at end of file
@@ -6,9 +6,14 @@ recommendation consistency, and caching functionality.
 """
 
 import os
+import re
 import sys
 import time
 import json
+import socket
+import hashlib
+import subprocess
+import tempfile
 import unittest
 import requests
 from dotenv import load_dotenv
@@ -22,6 +27,28 @@ CONFIG = {
     "TEST_MUSIC_GENRES": "Rock,Electronic"
 }
 
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    """Return a TCP port that is currently free on localhost"""
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_url(url, timeout=5):
+    """Poll a URL until it answers or the timeout expires"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
 class RecommenderSystemTest(unittest.TestCase):
     """Test suite for the Recommender System"""
     
@@ -315,6 +342,334 @@ Format each recommendation in a clean, consistent way without using markdown or
             except requests.exceptions.RequestException:
                 self.fail(f"Failed to access {asset}")
 
+    def test_07_static_asset_caching(self):
+        """Test compression, ETags and fingerprinted paths for static assets"""
+        print("\n----- Testing static asset caching -----")
+        
+        asset_url = f"{CONFIG['NODE_SERVER_URL']}/src/js/app.js"
+        try:
+            response = requests.get(asset_url, headers={"Accept-Encoding": "gzip"}, timeout=5)
+        except requests.exceptions.RequestException:
+            self.fail(f"Failed to access {asset_url}")
+        
+        # Preloaded assets are served compressed with an ETag
+        self.assertEqual(response.headers.get("Content-Encoding"), "gzip")
+        etag = response.headers.get("ETag")
+        self.assertIsNotNone(etag, "Static asset response has no ETag")
+        print(f"✅ Asset served gzip-compressed with ETag {etag}")
+        
+        # The encoding with the highest q-value wins, and * covers unlisted encodings
+        for accept, expected in [("br;q=0.1, gzip;q=1", "gzip"), ("*", "br"), ("gzip;q=0.5, identity", None)]:
+            response = requests.get(asset_url, headers={"Accept-Encoding": accept}, stream=True, timeout=5)
+            self.assertEqual(response.headers.get("Content-Encoding"), expected, f"Accept-Encoding: {accept}")
+            response.close()
+        print("✅ Content encoding negotiated by q-value")
+        
+        # A matching ETag should get a 304 without a body
+        response = requests.get(asset_url, headers={"If-None-Match": etag}, timeout=5)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        print("✅ Conditional request answered with 304 Not Modified")
+        
+        # index.html references fingerprinted assets with long-lived caching
+        response = requests.get(CONFIG["NODE_SERVER_URL"] + "/", timeout=5)
+        self.assertEqual(response.headers.get("Cache-Control"), "no-cache")
+        match = re.search(r'src="(src/js/app\.[0-9a-f]{8}\.js)"', response.text)
+        self.assertIsNotNone(match, "index.html does not reference a fingerprinted app.js")
+        
+        response = requests.get(f"{CONFIG['NODE_SERVER_URL']}/{match.group(1)}", timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response.headers.get("Cache-Control", ""))
+        print(f"✅ Fingerprinted asset /{match.group(1)} is cached long-term")
+
+    def test_08_cache_backends(self):
+        """Test shared cache backends and invalidation across replicas"""
+        print("\n----- Testing cache backends -----")
+        
+        from gemini_cache import CacheBackend, HTTPCache, MemoryCache, SQLiteCache, TieredCache
+        
+        # Backends missing part of the interface fail as soon as they are created
+        class IncompleteCache(CacheBackend):
+            def get_entry(self, key):
+                return None
+        
+        with self.assertRaises(TypeError):
+            IncompleteCache()
+        
+        def check_shared_backend(make_l2):
+            # Two tiered caches over one shared L2 behave like two replicas
+            replica_a = TieredCache(MemoryCache(), make_l2(), sync_interval=0)
+            replica_b = TieredCache(MemoryCache(), make_l2(), sync_interval=0)
+            
+            replica_a.put("key", "value")
+            self.assertEqual(replica_b.get("key"), "value")
+            self.assertEqual(replica_b.hits["l2"], 1)
+            self.assertEqual(replica_b.get("key"), "value")
+            self.assertEqual(replica_b.hits["l1"], 1)
+            
+            # Clearing on one replica must also drop the other replica's L1
+            replica_a.clear()
+            self.assertIsNone(replica_b.get("key"))
+            
+            # An L1 copy never outlives the L2 entry it came from
+            replica_a.put("brief", "value", ttl=0.2)
+            replica_a.l1.clear()
+            self.assertEqual(replica_a.get("brief"), "value")
+            time.sleep(0.3)
+            self.assertIsNone(replica_a.l1.get("brief"))
+            
+            replica_a.put("short", "lived", ttl=0.05)
+            time.sleep(0.1)
+            replica_a.l1.clear()
+            self.assertIsNone(replica_a.get("short"))
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, "cache.sqlite3")
+            check_shared_backend(lambda: SQLiteCache(db_path))
+            print("✅ SQLite cache shared and invalidated across replicas")
+        
+        # Run the networked backend against a local cache_server.js
+        port = free_port()
+        server = self.start_node("cache_server.js", {
+            "CACHE_SERVER_PORT": str(port),
+            "CACHE_SERVER_MAX_BODY": "1024",
+            "CACHE_TOKEN": "test-token"
+        })
+        try:
+            url = f"http://127.0.0.1:{port}"
+            wait_for_url(url + "/generation")
+            
+            check_shared_backend(lambda: HTTPCache(url, token="test-token"))
+            print("✅ HTTP cache shared and invalidated across replicas")
+            
+            # Clients without the shared token are turned away
+            for token in (None, "wrong-token"):
+                with self.assertRaisesRegex(RuntimeError, "401"):
+                    HTTPCache(url, token=token).get("key")
+            print("✅ Cache server rejects clients without the token")
+            
+            # Oversized entries are rejected without taking the server down
+            cache = HTTPCache(url, token="test-token")
+            with self.assertRaisesRegex(RuntimeError, "413"):
+                cache.put("large", "x" * 2048)
+            cache.put("small", "value")
+            self.assertEqual(cache.get("small"), "value")
+            print("✅ Cache server rejects oversized entries with 413")
+        finally:
+            server.terminate()
+            server.wait()
+        
+        # An unreachable shared tier degrades to the local L1
+        cache = TieredCache(MemoryCache(), HTTPCache(f"http://127.0.0.1:{port}"))
+        with self.assertLogs("gemini_cache", level="WARNING"):
+            cache.put("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+        print("✅ Cache falls back to the L1 when the shared tier is down")
+        
+        # Clearing still drops the L1 before reporting the shared tier failure
+        with self.assertRaises(OSError):
+            cache.clear()
+        self.assertIsNone(cache.get("key"))
+        print("✅ Clearing drops the L1 even when the shared tier is down")
+
+    def test_09_replica_cache_clear_http(self):
+        """Test that /api/cache-clear reaches every proxy replica over cache_server.js"""
+        print("\n----- Testing cache clear across replicas (http) -----")
+        
+        cache_port = free_port()
+        self.start_node("cache_server.js", {"CACHE_SERVER_PORT": str(cache_port), "CACHE_TOKEN": "test-token"})
+        wait_for_url(f"http://127.0.0.1:{cache_port}/generation")
+        
+        self.check_replica_cache_clear({
+            "CACHE_BACKEND": "http",
+            "CACHE_URL": f"http://127.0.0.1:{cache_port}",
+            "CACHE_TOKEN": "test-token"
+        })
+        print("✅ Cache clear on one replica reached the other through cache_server.js")
+    
+    def test_10_replica_cache_clear_file(self):
+        """Test that /api/cache-clear reaches every proxy replica through a shared directory"""
+        print("\n----- Testing cache clear across replicas (file) -----")
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.check_replica_cache_clear({"CACHE_BACKEND": "file", "CACHE_DIR": cache_dir})
+        print("✅ Cache clear on one replica reached the other through the shared directory")
+    
+    def start_node(self, script, env):
+        """Start a Node.js script from the project directory, stopped when the test ends"""
+        process = subprocess.Popen(
+            ["node", script],
+            cwd=PROJECT_DIR,
+            env={**os.environ, **env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.addCleanup(process.wait)
+        self.addCleanup(process.terminate)
+        return process
+    
+    def check_replica_cache_clear(self, cache_env):
+        """Seed the shared cache, clear it via one server.js replica and check the other misses"""
+        cache_env = {**cache_env, "CACHE_SYNC_INTERVAL": "0.2"}
+        replica_a, replica_b = [f"http://127.0.0.1:{free_port()}" for _ in range(2)]
+        # Misses go upstream; point them at a closed local port instead of Gemini
+        upstream = f"http://127.0.0.1:{free_port()}"
+        for replica in (replica_a, replica_b):
+            self.start_node("server.js", {
+                **cache_env,
+                "PORT": replica.rsplit(":", 1)[1],
+                "GEMINI_API_URL": upstream
+            })
+        for replica in (replica_a, replica_b):
+            wait_for_url(replica + "/api/cache-stats")
+        
+        # server.js keys responses on the MD5 of the JSON request body
+        body = json.dumps({"contents": [{"role": "user", "parts": [{"text": "Replica cache test"}]}]},
+                          separators=(",", ":"))
+        key = hashlib.md5(body.encode("utf-8")).hexdigest()
+        def run_shared_cache(script, *args):
+            # Talk to the shared tier directly through the Node.js backends
+            result = subprocess.run(
+                ["node", "-e", "const cache = require('./cache_backends').createCacheFromEnv();" + script, *args],
+                cwd=PROJECT_DIR,
+                env={**os.environ, **cache_env},
+                capture_output=True,
+                text=True,
+                timeout=10,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            return result.stdout.strip()
+        
+        run_shared_cache("cache.put(process.argv[1], process.argv[2])", key, '{"seeded": true}')
+        
+        def post_to_b():
+            return requests.post(replica_b + "/api/gemini", data=body,
+                                 headers={"Content-Type": "application/json"}, timeout=5)
+        
+        # Replica B reads the seeded entry from the L2, then from its own L1
+        for _ in range(2):
+            response = post_to_b()
+            self.assertEqual(response.headers.get("X-Cache"), "HIT")
+            self.assertEqual(response.json(), {"seeded": True})
+        stats = requests.get(replica_b + "/api/cache-stats", timeout=5).json()
+        self.assertEqual(stats["hits"], {"l1": 1, "l2": 1})
+        
+        response = requests.post(replica_a + "/api/cache-clear", timeout=5)
+        self.assertEqual(response.status_code, 200)
+        time.sleep(0.4)
+        
+        # The entry is gone from the shared tier...
+        shared = run_shared_cache("cache.get(process.argv[1]).then(data => console.log(JSON.stringify(data)))", key)
+        self.assertEqual(shared, "null")
+        
+        # ...and from replica B's L1, so B misses and goes to the (closed) upstream
+        response = post_to_b()
+        self.assertEqual(response.status_code, 500)
+        self.assertIsNone(response.headers.get("X-Cache"))
+        stats = requests.get(replica_b + "/api/cache-stats", timeout=5).json()
+        self.assertEqual(stats["hits"], {"l1": 1, "l2": 1})
+        self.assertEqual(stats["misses"], 1)
+
+    def test_11_memory_cache_bounds(self):
+        """Test that in-process caches stay bounded and evict least recently used entries"""
+        print("\n----- Testing in-process cache bounds -----")
+        
+        from gemini_cache import MemoryCache
+        
+        cache = MemoryCache(max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.get("c"), "3")
+        
+        # Expired entries are dropped on put even if never read again
+        cache.put("short", "lived", ttl=0.01)
+        time.sleep(0.05)
+        cache.put("d", "4")
+        self.assertEqual(cache.get("c"), "3")
+        self.assertEqual(cache.get_stats()["evictions"], 2)
+        print("✅ Python MemoryCache evicts least recently used and expired entries")
+        
+        script = """
+            const assert = require('assert');
+            const { MemoryCacheBackend } = require('./cache_backends');
+            (async () => {
+                const cache = new MemoryCacheBackend({ maxEntries: 2 });
+                await cache.put('a', '1');
+                await cache.put('b', '2');
+                await cache.get('a');
+                await cache.put('c', '3');
+                assert.strictEqual(await cache.get('b'), null);
+                assert.strictEqual(await cache.get('a'), '1');
+                assert.strictEqual(await cache.get('c'), '3');
+                await cache.put('short', 'lived', 10);
+                await new Promise(resolve => setTimeout(resolve, 50));
+                await cache.put('d', '4');
+                assert.strictEqual(await cache.get('c'), '3');
+                assert.strictEqual((await cache.getStats()).evictions, 2);
+            })().catch(error => {
+                console.error(error);
+                process.exit(1);
+            });
+        """
+        result = subprocess.run(["node", "-e", script], cwd=PROJECT_DIR, capture_output=True, text=True, timeout=10)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        print("✅ Node.js MemoryCacheBackend evicts least recently used and expired entries")
+
+    def test_12_shared_cache_cleanup(self):
+        """Test that shared on-host caches drop expired entries and never reuse a generation"""
+        print("\n----- Testing shared cache cleanup -----")
+        
+        from gemini_cache import SQLiteCache
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = SQLiteCache(os.path.join(tmp_dir, "cache.sqlite3"))
+            cache.put("short", "lived", ttl=0.01)
+            time.sleep(0.05)
+            cache.put("key", "value")
+            self.assertEqual(cache.get_stats()["total"], 1)
+        print("✅ SQLite cache sweeps expired rows on put")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            script = """
+                const assert = require('assert');
+                const { FileCacheBackend, MemoryCacheBackend, TieredCache } = require('./cache_backends');
+                (async () => {
+                    const dir = process.argv[1];
+                    const replicaA = new FileCacheBackend({ dir, sweepInterval: 0 });
+                    const replicaB = new FileCacheBackend({ dir });
+                    
+                    // Concurrent clears must still produce a new generation each
+                    const before = await replicaA.getGeneration();
+                    await Promise.all([replicaA.clear(), replicaB.clear()]);
+                    const after = await replicaA.getGeneration();
+                    assert.notStrictEqual(after, before);
+                    await replicaA.clear();
+                    assert.notStrictEqual(await replicaA.getGeneration(), after);
+                    
+                    await replicaA.put('short', 'lived', 10);
+                    await new Promise(resolve => setTimeout(resolve, 50));
+                    await replicaA.put('key', 'value');
+                    assert.strictEqual((await replicaA.getStats()).total, 1);
+                    
+                    // An L1 copy never outlives the L2 entry it came from
+                    const tiered = new TieredCache(new MemoryCacheBackend(), replicaB, { syncInterval: 0 });
+                    await replicaA.put('brief', 'value', 100);
+                    assert.strictEqual(await tiered.get('brief'), 'value');
+                    assert.ok((await tiered.l1.getEntry('brief')).ttl <= 100);
+                })().catch(error => {
+                    console.error(error);
+                    process.exit(1);
+                });
+            """
+            result = subprocess.run(["node", "-e", script, tmp_dir], cwd=PROJECT_DIR,
+                                    capture_output=True, text=True, timeout=10)
+            self.assertEqual(result.returncode, 0, result.stderr)
+        print("✅ File cache sweeps expired entries and writes a fresh generation on every clear")
+
 if __name__ == "__main__":
     print("===== Personal Recommender System Test Suite =====")
     print("Running comprehensive tests for all system components...")